@@ -12,12 +12,97 @@ values of above features ordered by feature ID (all features by default)
 
 import os, sys
 import csv
+import mmap
+import pickle
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+from operator import itemgetter
 from typing import List
 
 WALS_DIR = "cldf-datasets-wals-878ea47/cldf/"
+WALS_CACHE = ".wals_cache.pkl"
+# Bump whenever the layout of the cached tables changes, so that stale caches are rebuilt
+_CACHE_VERSION = 9
+_CACHED_TABLES = ("_feature2desc", "_feature_max_value", "_lang2desc", "_id2desc", "_name2desc",
+                  "_feat2col", "_code2col", "_lang2row", "_matrix", "_param_index")
+
+# Predefined sets of features of interest, see wals.get_predefined_feature_sets()
+MORPHOLOGICAL_FEATURES = ('22A', '26A', '27A', '28A', '29A', '30A', '33A', '34A', '37A', '38A',
+                          '49A', '51A', '57A', '59A', '65A', '66A', '67A', '69A', '70A', '73A',
+                          '74A', '75A', '78A', '94A', '101A', '102A', '111A', '112A')
+SYNTACTIC_FEATURES = ('81A', '81B', '82A', '83A', '84A', '85A', '86A', '87A', '88A', '89A',
+                      '90A', '90B', '90C', '90D', '90E', '90F', '90G', '91A', '92A', '93A',
+                      '94A', '95A', '96A', '97A', '98A', '99A', '100A', '101A', '112A', '115A',
+                      '116A', '143C', '143D', '143E', '143F', '144A', '144C', '144D')
+_FEATURE_SETS = {"morphological": MORPHOLOGICAL_FEATURES,
+                 "syntactic": SYNTACTIC_FEATURES}
+
+# WALS values are small integers; looking their strings up here is cheaper than calling int()
+_VALUE_LUT = {str(i): i for i in range(256)}
+
+# Number of feature sets memoized by wals._feature_columns() and wals._binarize_feature_set()
+_MEMO_CACHE_SIZE = 128
+
+# Columns read from each of the WALS CSV files
+_CODES_COLUMNS = ("Parameter_ID", "ID", "Description")
+_LANGUAGES_COLUMNS = ("ID", "Name", "ISO639P3code", "Macroarea", "Family", "Subfamily", "Genus")
+_VALUES_COLUMNS = ("Language_ID", "Parameter_ID", "Value")
+
+
+def _read_csv_columns(path: str, columns: List):
+    '''Read the CSV file at path and return, for each row, a tuple with the values of the given
+    columns (in the order given; at least two columns).
+    The file is memory-mapped and read sequentially, so the kernel can prefetch it in large
+    chunks instead of serving many small read() calls.'''
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        reader = csv.reader(line.decode('utf-8') for line in iter(mm.readline, b''))
+        header = next(reader)
+        header = {name: i for i, name in enumerate(header)}
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError("Missing columns " + ", ".join(missing) + " in " + path)
+        getter = itemgetter(*(header[column] for column in columns))
+        return list(map(getter, reader))
+
+
+def _current_umask() -> int:
+    '''The umask of the process. os.umask() can only read it by replacing it, so it is
+    put straight back.'''
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# Translation table turning a bytes object of 0/1 values into the ASCII digits "0"/"1"
+_BIT_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def pack_binary_vector(vector: List) -> int:
+    '''Pack a binary language vector (as returned with binary=True) into an int bitmap,
+    with bit i set iff vector[i] is 1. Bitmaps take one bit per feature and can be
+    compared with hamming_distance().'''
+    if not vector:
+        return 0
+    return int(bytes(vector[::-1]).translate(_BIT_DIGITS), 2)
+
+
+def hamming_distance(packed_a: int, packed_b: int) -> int:
+    '''Number of binary features on which two packed language vectors differ.'''
+    return bin(packed_a ^ packed_b).count("1")
+
 
 class wals:
-    def __init__(self, wals_datapath = None, binary = False):
+    __slots__ = ("datapath", "binary", "wals_values_path", "wals_codes_path", "wals_languages_path",
+                 "cache_path", "_loaded", "_load_lock", "_feature2desc", "_feature_max_value",
+                 "_lang2desc", "_id2desc", "_name2desc",
+                 "_feat2col", "_code2col", "_lang2row", "_matrix", "_param_index",
+                 "_columns_cache", "_last_columns", "_binarize_cache")
+
+    def __init__(self, wals_datapath = None, binary = False, use_cache = True):
         '''
         Initialize the WALS object
         Args:
@@ -26,27 +111,150 @@ class wals:
                              is converted to a set of binary features, one for each value. feature2idx
                              and idx2feature are updated accordingly to contain corresponding feature names;
                              this is done internally.
+            - use_cache (bool): whether to keep a pickle of the parsed tables next to the CSV files
+                                (default: True). The pickle is rebuilt whenever a CSV file is newer.
+                                Unpickling runs code, so anyone who can write to the data directory
+                                can run code in this process; a cache not owned by the current user
+                                is ignored, but pass use_cache=False for a directory shared with
+                                users you do not trust.
 
+        Construction does no I/O: the data is read on first use of any method or table.
+        The object may be shared across threads; the first use loads the data exactly once.
         '''
-        print("Reading WALS from ", wals_datapath)
         self.datapath = wals_datapath if wals_datapath else WALS_DIR
-        # print(self.datapath, wals_datapath)
-        self.feature2idx = {}
-        self.idx2feature = {}
-        self.feature2desc = {}
-        
+        self._loaded = False
+        self._load_lock = threading.Lock()
         self.binary = binary
 
         self.wals_values_path = os.path.join(self.datapath, "values.csv")
         self.wals_codes_path = os.path.join(self.datapath, "codes.csv")
         self.wals_languages_path = os.path.join(self.datapath, "languages.csv")
-        self.lang2desc = {}
+        self.cache_path = os.path.join(self.datapath, WALS_CACHE) if use_cache else None
+        self._reset_tables()
 
-        self.get_feature_description() # fills in self.feature2desc
-        self.init_language_info() # fills in self.lang2desc
-        # print(self.wals_codes_path)
+    def _reset_tables(self):
+        '''Set all the parsed tables, and everything memoized from them, back to empty.'''
+        self._feature2desc = {}
+        self._feature_max_value = {}
+        self._lang2desc = {}
+        self._id2desc = {}
+        self._name2desc = {}
+        self._feat2col = {}
+        self._code2col = {}
+        self._lang2row = {}
+        self._matrix = []
+        self._param_index = {}
+        self._columns_cache = {}
+        self._last_columns = None
+        self._binarize_cache = {}
 
-    def get_feature_description(self):
+    @property
+    def feature2desc(self):
+        '''Feature descriptions, see get_feature_description()'''
+        self._ensure_loaded()
+        return self._feature2desc
+
+    @property
+    def lang2desc(self):
+        '''Language descriptions keyed by ISO-code, see init_language_info()'''
+        self._ensure_loaded()
+        return self._lang2desc
+
+    @property
+    def id2desc(self):
+        '''Language descriptions keyed by WALS language ID'''
+        self._ensure_loaded()
+        return self._id2desc
+
+    @property
+    def name2desc(self):
+        '''Language descriptions keyed by normalized name'''
+        self._ensure_loaded()
+        return self._name2desc
+
+    def _ensure_loaded(self):
+        '''Load the WALS data on first use.'''
+        if not self._loaded:
+            with self._load_lock:
+                # Another thread may have loaded the data while this one waited for the lock
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+
+    def _load(self):
+        '''Parse each of the WALS CSV files exactly once, so that all lookups afterwards
+        are dictionary lookups instead of file scans.
+        If a fresh cache exists, the parsed tables are loaded from it instead.
+        '''
+        print("Reading WALS from ", self.datapath)
+        # A previous load may have failed partway; never build on top of its leftovers
+        self._reset_tables()
+        if self._load_cache():
+            return
+        # The three files are independent, so their reads overlap
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            codes, languages, values = executor.map(_read_csv_columns, \
+                (self.wals_codes_path, self.wals_languages_path, self.wals_values_path), \
+                (_CODES_COLUMNS, _LANGUAGES_COLUMNS, _VALUES_COLUMNS))
+        self.get_feature_description(codes) # fills in self.feature2desc
+        self.init_language_info(languages) # fills in self.lang2desc
+        self._load_values(values) # fills in self._matrix
+        self._save_cache()
+
+    def _load_cache(self):
+        '''Load the parsed tables from self.cache_path.
+        Returns: True if the cache exists, is owned by the current user, is newer than all the
+        CSV files, can be read and was written by this version of the code; False otherwise.
+        '''
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        cache_mtime = os.path.getmtime(self.cache_path)
+        for path in (self.wals_codes_path, self.wals_languages_path, self.wals_values_path):
+            if os.path.getmtime(path) > cache_mtime:
+                return False
+        try:
+            with open(self.cache_path, 'rb') as f:
+                # Never unpickle a file someone else could have planted
+                if hasattr(os, "getuid") and os.fstat(f.fileno()).st_uid != os.getuid():
+                    return False
+                cache = pickle.load(f)
+        except Exception:
+            # A truncated or corrupt pickle can fail with almost any exception; rebuild instead
+            return False
+        if not isinstance(cache, dict) or cache.get("version") != _CACHE_VERSION \
+                or not all(name in cache for name in _CACHED_TABLES):
+            return False
+        for name in _CACHED_TABLES:
+            setattr(self, name, cache[name])
+        return True
+
+    def _save_cache(self):
+        '''Write the parsed tables to self.cache_path. The data directory may be read-only,
+        in which case the cache is silently skipped.'''
+        if not self.cache_path:
+            return
+        cache = {name: getattr(self, name) for name in _CACHED_TABLES}
+        cache["version"] = _CACHE_VERSION
+        # A unique temp file per writer, so that processes building the cache at the same
+        # time never write into each other's file; the last os.replace wins
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=WALS_CACHE + ".", dir=os.path.dirname(self.cache_path))
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # mkstemp creates the file private to its owner; give it the mode a plain open()
+            # would, so the cache is exactly as readable as the umask allows
+            os.chmod(tmp_path, 0o666 & ~_current_umask())
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def get_feature_description(self, codes: List = None):
         '''Get the list of features in the database, ordered by feature ID
         Extract columns named "ID" and "Description from self.wals_codes_path"
         and store them in self.feature2desc
@@ -54,146 +262,173 @@ class wals:
         feature2desc = {gen_feature_id (81A): {feature_id1 (81A-1): {"Description": feature_description},
                                          feature_id2 (81A-2): {"Description": feature_description},
                                           "max_value": max_value for that param_id}
+        The max values are also kept flat in self._feature_max_value = {gen_feature_id (81A): max_value},
+        which is what the binary-feature code reads.
+        Args:
+            - codes (list): rows of codes.csv, as read by _read_csv_columns() (read from
+                            self.wals_codes_path by default)
         '''
 
-        with open(self.wals_codes_path, 'r') as f:
-
-            reader = csv.reader(f)
-            header = next(reader)
-            paramid_idx = header.index("Parameter_ID")
-            desc_idx = header.index("Description")
-            id_idx = header.index("ID")
+        if codes is None:
+            codes = _read_csv_columns(self.wals_codes_path, _CODES_COLUMNS)
+        for param_id, code_id, description in codes:
+            param_id, code_id = sys.intern(param_id), sys.intern(code_id)
+            if param_id not in self._feature2desc:
+                self._feature2desc[param_id] = {}
+                self._feature2desc[param_id]["max_value"] = 0
+            id = int(code_id.split("-")[1])
+            self._feature2desc[param_id][code_id] = {"Description": description}
+            self._feature_max_value[param_id] = max(self._feature_max_value.get(param_id, 0), id)
+            self._feature2desc[param_id]["max_value"] = self._feature_max_value[param_id]
 
-            for row in reader:
-                if row[paramid_idx] not in self.feature2desc:
-                    self.feature2desc[row[paramid_idx]] = {}
-                    self.feature2desc[row[paramid_idx]]["max_value"] = 0
-                id = int(row[id_idx].split("-")[1])
-                self.feature2desc[row[paramid_idx]][row[id_idx]] = {"Description": row[desc_idx]}
-                self.feature2desc[row[paramid_idx]]["max_value"] = \
-                    max(self.feature2desc[row[paramid_idx]]["max_value"], id)
 
-
-    def init_language_info(self):
+    def init_language_info(self, languages: List = None):
         '''For all languages, get language name and ISO-code,
         place spoken, phylogenetic family.
-        Returns: lang2desc (dict): mapping from language id to language name, iso-code, place, family'''
-        with open(self.wals_languages_path, 'r') as f:
-            reader = csv.reader(f)
-            header = next(reader)
-            id_idx = header.index("ID")
-            name_idx = header.index("Name")
-            iso639_code = header.index("ISO639P3code")
-            place_idx = header.index("Macroarea")
-            family_idx = header.index("Family")
-            subfamily_idx = header.index("Subfamily")
-            genus_idx = header.index("Genus")
-
-            for row in reader:
-                self.lang2desc[row[iso639_code]] = {"Name": row[name_idx], \
-                                            "ISO639P3code": row[iso639_code], \
-                                            "Macroarea": row[place_idx], \
-                                            "Family": row[family_idx], \
-                                            "Subfamily": row[subfamily_idx], \
-                                            "Genus": row[genus_idx],\
-                                            "ID": row[id_idx]}
+        Args:
+            - languages (list): rows of languages.csv, as read by _read_csv_columns() (read from
+                                self.wals_languages_path by default)
+        Returns: lang2desc (dict): mapping from ISO-code to language name, iso-code, place, family
+        The same descriptions are also indexed by WALS language ID in id2desc, and by normalized
+        (stripped, casefolded) name in name2desc.'''
+        if languages is None:
+            languages = _read_csv_columns(self.wals_languages_path, _LANGUAGES_COLUMNS)
+        for language_id, name, iso639_code, place, family, subfamily, genus in languages:
+            language_id, iso639_code = sys.intern(language_id), sys.intern(iso639_code)
+            # Areas, families and genera repeat across many languages; share one string each
+            place, family = sys.intern(place), sys.intern(family)
+            subfamily, genus = sys.intern(subfamily), sys.intern(genus)
+            lang_desc = {"Name": name, \
+                         "ISO639P3code": iso639_code, \
+                         "Macroarea": place, \
+                         "Family": family, \
+                         "Subfamily": subfamily, \
+                         "Genus": genus,\
+                         "ID": language_id}
+            # Many WALS languages have no ISO code; they would all collide on the empty key
+            if iso639_code:
+                self._lang2desc[iso639_code] = lang_desc
+            self._id2desc[language_id] = lang_desc
+            self._name2desc.setdefault(name.strip().casefold(), lang_desc)
         
-    def get_language_info(self, language_id: str = None, language_name: str = None):
+    def _load_values(self, values: List = None):
+        '''Pivot values.csv into a dense (language x feature) table in a single pass.
+        Row self._lang2row[language_id] of self._matrix holds the values of that language,
+        in column self._feat2col[param_id]; 0 marks a missing value.
+        Rows are stored as arrays of bytes (WALS values are small integers) rather than lists of ints,
+        falling back to int16 if some value does not fit in a byte.
+        Each row ends with one extra column, always 0, which stands in for features that
+        have no column of their own.
+        For binary features, self._code2col maps each code ID (81A-2) to its (column, value) pair.
+        self._param_index is the transposed view, {param_id (81A): {language_id (ger): value (2)}},
+        for feature-oriented queries.
+        '''
+        for param_id in self._feature2desc:
+            self._feat2col[param_id] = len(self._feat2col)
+
+        if values is None:
+            values = _read_csv_columns(self.wals_values_path, _VALUES_COLUMNS)
+        # IDs are interned so that the keys of _lang2row/_feat2col are shared with lang2desc
+        # and feature2desc, and lookups with those strings hit the identity fast path
+        values = [(sys.intern(language_id), sys.intern(param_id), \
+                   _VALUE_LUT[value] if value in _VALUE_LUT else int(value)) \
+                  for language_id, param_id, value in values]
+
+        for language_id, param_id, _ in values:
+            if language_id not in self._lang2row:
+                self._lang2row[language_id] = len(self._lang2row)
+            if param_id not in self._feat2col:
+                self._feat2col[param_id] = len(self._feat2col)
+
+        all_values = [value for _, _, value in values]
+        typecode = 'B' if 0 <= min(all_values, default=0) and max(all_values, default=0) <= 255 else 'h'
+        self._matrix = [array(typecode, [0]) * (len(self._feat2col) + 1) for _ in range(len(self._lang2row))]
+        max_values = [0] * len(self._feat2col)
+        for language_id, param_id, value in values:
+            col = self._feat2col[param_id]
+            self._matrix[self._lang2row[language_id]][col] = value
+            max_values[col] = max(max_values[col], value)
+            self._param_index.setdefault(param_id, {})[language_id] = value
+
+        for param_id, col in self._feat2col.items():
+            max_value = max(max_values[col], self._feature_max_value.get(param_id, 0))
+            for value in range(1, max_value + 1):
+                self._code2col[sys.intern(param_id + "-" + str(value))] = (col, value)
+
+    def get_language_info(self, language_id: str = None, language_name: str = None, wals_id: str = None):
         '''For a given language, get information about that language: language name and ISO-code,
         place spoken, phylogenetic family.
         Args:
-            - language_id (str): language ID 
-            - language_name (str): language name (either one will work)
+            - language_id (str): ISO 639-3 code
+            - language_name (str): language name
+            - wals_id (str): WALS language ID, as used by get_language_vector() (any one will work)
         Returns: 
             - lang2desc (dict): mapping from language id to language name, iso-code, place, family
             - None, if language not found
         '''
+        self._ensure_loaded()
         if language_id:
-            return self.lang2desc[language_id] if language_id in self.lang2desc else None
+            return self._lang2desc.get(language_id)
         if language_name:
-            for _, lang_desc in self.lang2desc.items():
-                # print(lang_desc["Name"])
-                if lang_desc["Name"].strip().casefold() == language_name.strip().casefold():
-                    return lang_desc
-            return None
-        raise ValueError("Provide either language ID or language name.")
+            return self._name2desc.get(language_name.strip().casefold())
+        if wals_id:
+            return self._id2desc.get(wals_id)
+        raise ValueError("Provide either language ID, language name or WALS ID.")
     
+    def get_feature_column(self, param_id: str):
+        '''For a given feature, get the value every language takes for it.
+        Args:
+            - param_id (str): feature ID, e.g. 81A
+        Returns:
+            - language2value (dict): mapping from language ID to value, for all languages
+                                     with a value for that feature (empty if feature not found);
+                                     a copy, so it is safe to modify
+        '''
+        self._ensure_loaded()
+        return dict(self._param_index.get(param_id, {}))
+
     def get_predefined_feature_sets(self, feature_set_type: str = None) -> List : 
         '''Return sets of features of interest, e.g. syntactic features
         Args:
             - feature_set_type (str): type of feature set to return
         Returns:
             - features (list): list of features of interest
-            - num_values_per_feature (list): number of values per feature (relevant for binary features)
         '''
         
         if feature_set_type == "phonological":
             raise NotImplementedError
-        elif feature_set_type == "morphological":
-            features = ['22A', '26A', '27A', '28A', '29A', '30A', '33A', '34A', '37A', '38A', '49A', '51A', '57A', '59A', '65A', '66A', '67A', '69A', '70A', '73A', '74A', '75A', '78A', '94A', '101A', '102A', '111A', '112A']
-        elif feature_set_type == "syntactic":
-            features = ['81A',
-'81B',
-'82A',
-'83A',
-'84A',
-'85A',
-'86A',
-'87A',
-'88A',
-'89A',
-'90A',
-'90B',
-'90C',
-'90D',
-'90E',
-'90F',
-'90G',
-'91A',
-'92A',
-'93A',
-'94A',
-'95A',
-'96A',
-'97A',
-'98A',
-'99A',
-'100A',
-'101A',
-'112A',
-'115A',
-'116A',
-'143C',
-'143D',
-'143E',
-'143F',
-'144A',
-'144C',
-'144D',]
-        else:
+        if feature_set_type not in _FEATURE_SETS:
             raise ValueError("Invalid feature set type")
         
-        return features
+        return list(_FEATURE_SETS[feature_set_type])
 
     def _binarize_feature_set(self, feature_set):
         '''Given a feature vector set, binarize it by converting each multi-value feature 
         to a set of binary features, one for each value.
         This function is called internally by get_feature_vector() if self.binary is True.
+        The result is memoized per feature set, since the same sets are binarized over and over.
         Args:
             - feature_set (list): feature vector
         Returns:
-            - feature_set (list): binarized feature vector, with cell for each binary feature
+            - feature_set (tuple): binarized feature vector, with cell for each binary feature
         '''
+        key = tuple(feature_set)
+        binarized_feature_set = self._binarize_cache.get(key)
+        if binarized_feature_set is not None:
+            return binarized_feature_set
+
         binarized_feature_set = []
         for feature in feature_set:
-            if feature in self.feature2desc:
-                for i in range(1, self.feature2desc[feature]["max_value"]+1):
-                    binarized_feature_set.append(feature + "-" + str(i)) # e.g. 81A-1, we 
-                    # just reconstruct the feature ID from the param_id and the value
-                    # These are just the keys of self.feature2desc[feature]
-                    # so we can do this more neatly, but this way is more explicit
-            else:
+            if feature not in self._feature_max_value:
                 raise ValueError("Invalid feature ID in binarize_feature_set()")
+            # e.g. 81A-1: the feature ID is reconstructed from the param_id and the value
+            binarized_feature_set.extend([feature + "-" + str(i) \
+                                          for i in range(1, self._feature_max_value[feature] + 1)])
+        binarized_feature_set = tuple(binarized_feature_set)
+
+        if len(self._binarize_cache) >= _MEMO_CACHE_SIZE:
+            self._binarize_cache.clear()
+        self._binarize_cache[key] = binarized_feature_set
         return binarized_feature_set
 
     def get_feature_vector(self, feature_set_type: str = None, feature_set: List = None):
@@ -201,65 +436,127 @@ class wals:
         feature2idx (dict): mapping from feature id to index in language vector
         idx2feature (dict): mapping from index in language vector to feature id
         '''
+        self._ensure_loaded()
 
         if feature_set_type:
             feature_set = self.get_predefined_feature_sets(feature_set_type)
         elif not feature_set:
             # If no feature set is specified, use all features
-            feature_set = list(self.feature2desc.keys())
+            feature_set = list(self._feature2desc.keys())
+        else:
+            # Drop repeated features, which would otherwise get an index in idx2feature
+            # but share one in feature2idx
+            feature_set = list(dict.fromkeys(feature_set))
         
         if self.binary:
             feature_set = self._binarize_feature_set(feature_set)
         
-        feature2idx = {}
-        idx2feature = {}
-        for feature in feature_set:
-            feature2idx[feature] = len(feature2idx)
-            idx2feature[len(idx2feature)] = feature
+        feature2idx = {feature: idx for idx, feature in enumerate(feature_set)}
+        idx2feature = dict(enumerate(feature_set))
 
         return feature2idx, idx2feature
         
 
+    def _feature_columns(self, feature2idx: dict):
+        '''Resolve each feature in feature2idx to its column in self._matrix.
+        Callers usually pass the same feature2idx over and over, so the result is memoized
+        on the contents of feature2idx.
+        Returns:
+            - in binary mode, a tuple of (column, {code value: index in language vector}) pairs,
+              one per column that holds any of the features; features without a column are left out
+            - otherwise, a getter that takes a row of self._matrix and returns the values of all
+              features, in index order, in a single C-level call
+        '''
+        # Fast path for the usual pattern of passing the same feature2idx for language after
+        # language: comparing two dicts is much cheaper than building and hashing the cache key
+        if self._last_columns is not None:
+            binary, last_feature2idx, columns = self._last_columns
+            if binary == self.binary and last_feature2idx == feature2idx:
+                return columns
+
+        key = (self.binary, tuple(feature2idx.items()))
+        columns = self._columns_cache.get(key)
+        if columns is not None:
+            self._last_columns = (self.binary, dict(feature2idx), columns)
+            return columns
+
+        if self.binary:
+            # Look up each column once and map its value straight to the index it switches on,
+            # instead of comparing every code of every feature
+            value2idx_by_col = {}
+            for feature, idx in feature2idx.items():
+                if feature in self._code2col:
+                    col, value = self._code2col[feature]
+                    value2idx_by_col.setdefault(col, {})[value] = idx
+            columns = tuple(value2idx_by_col.items())
+        else:
+            zero_col = len(self._feat2col)
+            cols = [zero_col] * len(feature2idx)
+            for feature, idx in feature2idx.items():
+                cols[idx] = self._feat2col.get(feature, zero_col)
+            # itemgetter returns a bare value rather than a tuple when given a single item
+            columns = itemgetter(*cols) if len(cols) > 1 else lambda values: (values[cols[0]],)
+
+        if len(self._columns_cache) >= _MEMO_CACHE_SIZE:
+            self._columns_cache.clear()
+        self._columns_cache[key] = columns
+        self._last_columns = (self.binary, dict(feature2idx), columns)
+        return columns
+
+    def _gather_language_vector(self, language_id: str, columns, size: int):
+        '''Fill a language vector of length size from the row of language_id,
+        given the columns resolved by _feature_columns().'''
+        row = self._lang2row.get(language_id)
+        if row is None:
+            return [0] * size
+        values = self._matrix[row]
+
+        if self.binary:
+            lang_vector = [0] * size
+            for col, value2idx in columns:
+                idx = value2idx.get(values[col])
+                if idx is not None:
+                    lang_vector[idx] = 1
+            return lang_vector
+
+        return list(columns(values))
+
     def get_language_vector(self, language_id: str, feature2idx: dict = None):
         '''For a given language, get the language vector given some set of features: 
         values of above features ordered by feature ID (all features by default)'''
+        self._ensure_loaded()
 
         if not feature2idx:
             # If no feature2idx is specified, use all features
             feature2idx, _ = self.get_feature_vector()
 
-        lang_vector = [0] * len(feature2idx)
-        with open(self.wals_values_path, 'r') as f:
-            reader = csv.reader(f)
-            header = next(reader)
-            id_idx = header.index("Language_ID")
-            feature_idx = header.index("Parameter_ID")
-            value_idx = header.index("Value")
-
-            if self.binary:
-                # reconstruct feature ID from param_id and value
-                # This is the same as Code-ID in the codes.csv file
-                for row in reader:
-                    feature = row[feature_idx] + "-" + row[value_idx] 
-                    if row[id_idx] == language_id and feature in feature2idx:
-                        lang_vector[feature2idx[feature]] = 1
-
-            else:
-                for row in reader:
-                    if row[id_idx] == language_id and row[feature_idx] in feature2idx:
-                        lang_vector[feature2idx[row[feature_idx]]] = int(row[value_idx])
-
-        return lang_vector
-
-
-# wals_obj = wals()
-# language_info = wals_obj.get_language_info("deu")
-# print(language_info)
-# # print(wals_obj.feature2desc)
-# # print(wals_obj.get_language_info("hin"))
-# feature2idx, idx2feature = wals_obj.get_feature_vector(feature_set_type="syntactic")
-# vector = wals_obj.get_language_vector("deu", feature2idx)
-# for i in range(len(vector)):
-#     print(idx2feature[i], vector[i], wals_obj.feature2desc[idx2feature[i]])
+        columns = self._feature_columns(feature2idx)
+        return self._gather_language_vector(language_id, columns, len(feature2idx))
+
+    def get_language_matrix(self, language_ids: List, feature2idx: dict = None):
+        '''For a list of languages, get all their language vectors at once.
+        The features are resolved once and reused for every language, which is much cheaper
+        than calling get_language_vector() per language.
+        Args:
+            - language_ids (list): language IDs
+            - feature2idx (dict): mapping from feature id to index in language vector (all features by default)
+        Returns:
+            - matrix (list): one language vector per language in language_ids, in the same order
+        '''
+        self._ensure_loaded()
+        if not feature2idx:
+            feature2idx, _ = self.get_feature_vector()
+
+        columns = self._feature_columns(feature2idx)
+        return [self._gather_language_vector(language_id, columns, len(feature2idx)) \
+                for language_id in language_ids]
 
 
+if __name__ == "__main__":
+    wals_obj = wals()
+    language_info = wals_obj.get_language_info("deu")
+    print(language_info)
+    feature2idx, idx2feature = wals_obj.get_feature_vector(feature_set_type="syntactic")
+    vector = wals_obj.get_language_vector(language_info["ID"], feature2idx)
+    for i in range(len(vector)):
+        print(idx2feature[i], vector[i], wals_obj.feature2desc[idx2feature[i]])
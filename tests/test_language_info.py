@@ -0,0 +1,310 @@
+'''Tests for language_info.wals on a tiny WALS-shaped dataset.
+The expected language vectors are computed the way the original implementation did,
+by scanning values.csv row by row, so the indexed tables are checked against that output.
+Run with: python -m unittest discover -s tests
+'''
+
+import os, sys
+import csv
+import io
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import language_info
+from language_info import wals, pack_binary_vector, hamming_distance
+
+CODES = [("ID", "Parameter_ID", "Name", "Description"),
+         ("81A-1", "81A", "SOV", "Subject-object-verb"),
+         ("81A-2", "81A", "SVO", "Subject-verb-object"),
+         ("81A-3", "81A", "VSO", "Verb-subject-object"),
+         ("85A-1", "85A", "Postpositions", "Postpositions"),
+         ("85A-2", "85A", "Prepositions", "Prepositions"),
+         ("26A-1", "26A", "Little affixation", "Little affixation")]
+LANGUAGES = [("ID", "Name", "Macroarea", "ISO639P3code", "Family", "Subfamily", "Genus"),
+             ("ger", "German", "Eurasia", "deu", "Indo-European", "Germanic", "Germanic"),
+             ("jpn", "Japanese", "Eurasia", "jpn", "Japanese", "", "Japanese"),
+             ("iri", "Irish", "Eurasia", "gle", "Indo-European", "Celtic", "Celtic"),
+             ("xyz", "Unclassified", "Africa", "", "", "", ""),
+             # A WALS ID that is also another language's ISO code, and a second empty ISO code
+             ("deu", " Deutsch Test ", "Africa", "", "", "", "")]
+VALUES = [("ID", "Language_ID", "Parameter_ID", "Value", "Code_ID"),
+          ("81A-ger", "ger", "81A", "1", "81A-1"),
+          ("85A-ger", "ger", "85A", "2", "85A-2"),
+          ("81A-jpn", "jpn", "81A", "1", "81A-1"),
+          ("85A-jpn", "jpn", "85A", "1", "85A-1"),
+          ("26A-jpn", "jpn", "26A", "1", "26A-1"),
+          ("81A-iri", "iri", "81A", "3", "81A-3")]
+LANGUAGE_IDS = ["ger", "jpn", "iri", "xyz"]
+
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+
+def _reference_vector(datapath, language_id, feature2idx, binary):
+    '''The language vector as the original get_language_vector() computed it.'''
+    lang_vector = [0] * len(feature2idx)
+    with open(os.path.join(datapath, "values.csv"), 'r') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        id_idx = header.index("Language_ID")
+        feature_idx = header.index("Parameter_ID")
+        value_idx = header.index("Value")
+        for row in reader:
+            if row[id_idx] != language_id:
+                continue
+            if binary:
+                feature = row[feature_idx] + "-" + row[value_idx]
+                if feature in feature2idx:
+                    lang_vector[feature2idx[feature]] = 1
+            elif row[feature_idx] in feature2idx:
+                lang_vector[feature2idx[row[feature_idx]]] = int(row[value_idx])
+    return lang_vector
+
+
+class WalsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.datapath = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.datapath)
+        _write_csv(os.path.join(self.datapath, "codes.csv"), CODES)
+        _write_csv(os.path.join(self.datapath, "languages.csv"), LANGUAGES)
+        _write_csv(os.path.join(self.datapath, "values.csv"), VALUES)
+        self.cache_path = os.path.join(self.datapath, language_info.WALS_CACHE)
+
+    def make_wals(self, **kwargs):
+        '''A wals instance on the test data, loaded eagerly and without the "Reading WALS" noise.'''
+        wals_obj = wals(self.datapath, **kwargs)
+        with redirect_stdout(io.StringIO()):
+            wals_obj.get_feature_vector()
+        return wals_obj
+
+    def test_language_vector_matches_reference(self):
+        for binary in (False, True):
+            wals_obj = self.make_wals(binary=binary, use_cache=False)
+            feature_sets = [None, ["85A", "81A"]]
+            if not binary:
+                # Binary mode rejects unknown features; value mode leaves their cells 0
+                feature_sets.append(["85A", "99A"])
+            for feature_set in feature_sets:
+                feature2idx, _ = wals_obj.get_feature_vector(feature_set=feature_set)
+                for language_id in LANGUAGE_IDS + ["nonexistent"]:
+                    self.assertEqual(list(wals_obj.get_language_vector(language_id, feature2idx)),
+                                     _reference_vector(self.datapath, language_id, feature2idx, binary),
+                                     (binary, feature_set, language_id))
+
+    def test_language_matrix(self):
+        for binary in (False, True):
+            wals_obj = self.make_wals(binary=binary, use_cache=False)
+            feature2idx, _ = wals_obj.get_feature_vector(feature_set=["85A", "81A"])
+            matrix = wals_obj.get_language_matrix(LANGUAGE_IDS, feature2idx)
+            self.assertEqual([list(row) for row in matrix],
+                             [list(wals_obj.get_language_vector(language_id, feature2idx)) \
+                              for language_id in LANGUAGE_IDS])
+        self.assertEqual(list(matrix[0]), [0, 1, 1, 0, 0])  # German, binary: 85A-2 and 81A-1
+
+    def test_repeated_features_are_dropped(self):
+        wals_obj = self.make_wals(use_cache=False)
+        feature2idx, idx2feature = wals_obj.get_feature_vector(feature_set=["85A", "81A", "85A", "81A"])
+        self.assertEqual(feature2idx, {"85A": 0, "81A": 1})
+        self.assertEqual(idx2feature, {0: "85A", 1: "81A"})
+        self.assertEqual(wals_obj.get_language_vector("ger", feature2idx), [2, 1])
+        for feature_set_type in ("morphological", "syntactic"):
+            feature_set = wals_obj.get_predefined_feature_sets(feature_set_type)
+            self.assertEqual(len(feature_set), len(set(feature_set)), feature_set_type)
+
+        wals_obj = self.make_wals(binary=True, use_cache=False)
+        feature2idx, idx2feature = wals_obj.get_feature_vector(feature_set=["85A", "85A"])
+        self.assertEqual(idx2feature, {0: "85A-1", 1: "85A-2"})
+        self.assertEqual(wals_obj.get_language_vector("ger", feature2idx), [0, 1])
+
+    def test_feature2idx_edited_between_calls(self):
+        for binary in (False, True):
+            wals_obj = self.make_wals(binary=binary, use_cache=False)
+            feature2idx, _ = wals_obj.get_feature_vector(feature_set=["81A", "85A"])
+            expected = lambda language_id: _reference_vector(self.datapath, language_id, feature2idx, binary)
+            self.assertEqual(wals_obj.get_language_vector("jpn", feature2idx), expected("jpn"))
+            # The same dict, edited in place, must not be answered from the previous call
+            first, last = next(iter(feature2idx)), len(feature2idx) - 1
+            feature2idx[first], feature2idx[next(reversed(feature2idx))] = last, feature2idx[first]
+            self.assertEqual(wals_obj.get_language_vector("jpn", feature2idx), expected("jpn"))
+            feature2idx["26A-1" if binary else "26A"] = len(feature2idx)
+            for language_id in LANGUAGE_IDS:
+                self.assertEqual(wals_obj.get_language_vector(language_id, feature2idx), expected(language_id))
+            del feature2idx[first]
+            feature2idx = {feature: idx for idx, feature in enumerate(feature2idx)}
+            self.assertEqual(wals_obj.get_language_matrix(LANGUAGE_IDS, feature2idx), \
+                             [expected(language_id) for language_id in LANGUAGE_IDS])
+
+    def test_binarized_feature_sets_are_memoized(self):
+        wals_obj = self.make_wals(binary=True, use_cache=False)
+        binarized = wals_obj._binarize_feature_set(["85A", "81A"])
+        self.assertEqual(binarized, ("85A-1", "85A-2", "81A-1", "81A-2", "81A-3"))
+        self.assertIs(wals_obj._binarize_feature_set(["85A", "81A"]), binarized)
+        self.assertEqual(wals_obj._binarize_feature_set(["81A", "85A"]), \
+                         ("81A-1", "81A-2", "81A-3", "85A-1", "85A-2"))
+        # Callers get their own dicts, so editing one never leaks into the memoized set
+        feature2idx, idx2feature = wals_obj.get_feature_vector(feature_set=["85A", "81A"])
+        feature2idx["26A-1"] = 5
+        idx2feature[5] = "26A-1"
+        self.assertEqual(wals_obj.get_feature_vector(feature_set=["85A", "81A"]), \
+                         (dict(zip(binarized, range(5))), dict(enumerate(binarized))))
+        with self.assertRaises(ValueError):
+            wals_obj._binarize_feature_set(["99A"])
+
+        memo_size = language_info._MEMO_CACHE_SIZE
+        self.addCleanup(setattr, language_info, "_MEMO_CACHE_SIZE", memo_size)
+        language_info._MEMO_CACHE_SIZE = 2
+        feature_sets = [["26A"], ["81A"], ["85A"], ["26A", "85A"], ["26A"]]
+        for feature_set in feature_sets:
+            self.assertEqual(wals_obj._binarize_feature_set(feature_set), \
+                             tuple(code for feature in feature_set for code, *_ in CODES[1:] \
+                                   if code.startswith(feature + "-")))
+            self.assertLessEqual(len(wals_obj._binarize_cache), 2)
+
+    def test_language_info(self):
+        wals_obj = self.make_wals(use_cache=False)
+        self.assertEqual(wals_obj.get_language_info("deu")["ID"], "ger")
+        self.assertEqual(wals_obj.get_language_info(language_id="gle")["Name"], "Irish")
+        self.assertIsNone(wals_obj.get_language_info("iri"))
+        # WALS IDs are looked up explicitly, never mixed up with ISO codes
+        self.assertEqual(wals_obj.get_language_info(wals_id="iri")["ISO639P3code"], "gle")
+        self.assertEqual(wals_obj.get_language_info(wals_id="deu")["Name"], " Deutsch Test ")
+        self.assertIsNone(wals_obj.get_language_info(wals_id="gle"))
+        # Names are matched ignoring case and surrounding whitespace
+        self.assertEqual(wals_obj.get_language_info(language_name="  JAPANESE ")["ID"], "jpn")
+        self.assertEqual(wals_obj.get_language_info(language_name="deutsch test")["ID"], "deu")
+        self.assertIsNone(wals_obj.get_language_info(language_name="Klingon"))
+        # Languages without an ISO code are all kept, under their WALS IDs only
+        self.assertNotIn("", wals_obj.lang2desc)
+        self.assertEqual(wals_obj.id2desc["xyz"]["Name"], "Unclassified")
+        self.assertEqual(wals_obj.id2desc["deu"]["Name"], " Deutsch Test ")
+        with self.assertRaises(ValueError):
+            wals_obj.get_language_info()
+
+    def test_feature_column(self):
+        wals_obj = self.make_wals(use_cache=False)
+        self.assertEqual(wals_obj.get_feature_column("81A"), {"ger": 1, "jpn": 1, "iri": 3})
+        self.assertEqual(wals_obj.get_feature_column("99A"), {})
+        # The result is a copy; changing it must not change later answers
+        wals_obj.get_feature_column("85A")["ger"] = 7
+        self.assertEqual(wals_obj.get_feature_column("85A"), {"ger": 2, "jpn": 1})
+
+    def test_pack_binary_vector(self):
+        self.assertEqual(pack_binary_vector([]), 0)
+        self.assertEqual(pack_binary_vector([1, 0, 1, 1]), 0b1101)
+        wals_obj = self.make_wals(binary=True, use_cache=False)
+        feature2idx, _ = wals_obj.get_feature_vector()
+        ger, jpn, iri = (pack_binary_vector(wals_obj.get_language_vector(language_id, feature2idx)) \
+                         for language_id in ("ger", "jpn", "iri"))
+        self.assertEqual(hamming_distance(ger, ger), 0)
+        self.assertEqual(hamming_distance(ger, jpn), 3)  # 85A differs, jpn has 26A
+        self.assertEqual(hamming_distance(ger, iri), 3)  # 81A differs, iri lacks 85A
+
+    def test_cache_is_reused_when_fresh(self):
+        expected = self.make_wals(use_cache=False).get_language_matrix(LANGUAGE_IDS)
+        self.make_wals()
+        self.assertTrue(os.path.exists(self.cache_path))
+        wals_obj = wals(self.datapath)
+        self.assertTrue(wals_obj._load_cache())
+        self.assertEqual(self.make_wals().get_language_matrix(LANGUAGE_IDS), expected)
+
+    def test_cache_is_rebuilt_when_a_csv_is_newer(self):
+        self.make_wals()
+        _write_csv(os.path.join(self.datapath, "values.csv"), VALUES[:2])
+        cache_mtime = os.path.getmtime(self.cache_path)
+        os.utime(os.path.join(self.datapath, "values.csv"), (cache_mtime + 10, cache_mtime + 10))
+        self.assertFalse(wals(self.datapath)._load_cache())
+        wals_obj = self.make_wals()
+        self.assertEqual(wals_obj.get_feature_column("81A"), {"ger": 1})
+        self.assertEqual(wals_obj.get_feature_column("85A"), {})
+
+    def test_cache_is_rebuilt_when_the_version_changes(self):
+        self.make_wals()
+        version = language_info._CACHE_VERSION
+        self.addCleanup(setattr, language_info, "_CACHE_VERSION", version)
+        language_info._CACHE_VERSION = version + 1
+        self.assertFalse(wals(self.datapath)._load_cache())
+        # Loading rewrites the cache with the new version
+        self.make_wals()
+        self.assertTrue(wals(self.datapath)._load_cache())
+
+    def test_corrupt_cache_is_rebuilt(self):
+        expected = self.make_wals(use_cache=False).get_language_matrix(LANGUAGE_IDS)
+        self.make_wals()
+        with open(self.cache_path, 'rb') as f:
+            valid = f.read()
+        corrupt_caches = [valid[:len(valid) // 2], \
+                          valid[:40] + bytes([valid[40] ^ 0xff]) + valid[41:], \
+                          pickle.dumps(["not", "a", "dict"]), \
+                          pickle.dumps({"version": language_info._CACHE_VERSION})]
+        for corrupt_cache in corrupt_caches:
+            with open(self.cache_path, 'wb') as f:
+                f.write(corrupt_cache)
+            self.assertFalse(wals(self.datapath)._load_cache())
+            self.assertEqual(self.make_wals().get_language_matrix(LANGUAGE_IDS), expected)
+            # Loading replaced the corrupt cache with a good one
+            self.assertTrue(wals(self.datapath)._load_cache())
+
+    @unittest.skipUnless(os.name == "posix", "file modes and owners are POSIX")
+    def test_cache_mode_follows_umask(self):
+        for umask, mode in ((0o022, 0o644), (0o077, 0o600)):
+            old_umask = os.umask(umask)
+            try:
+                self.make_wals()
+            finally:
+                os.umask(old_umask)
+            self.assertEqual(os.stat(self.cache_path).st_mode & 0o777, mode)
+            os.remove(self.cache_path)
+
+    @unittest.skipUnless(os.name == "posix", "file modes and owners are POSIX")
+    def test_cache_of_another_user_is_ignored(self):
+        self.make_wals()
+        self.assertTrue(wals(self.datapath)._load_cache())
+        with mock.patch.object(language_info.os, "getuid", return_value=os.getuid() + 1):
+            self.assertFalse(wals(self.datapath)._load_cache())
+
+    def test_failed_load_leaves_no_partial_tables(self):
+        expected = self.make_wals(use_cache=False).get_language_matrix(LANGUAGE_IDS)
+        _write_csv(os.path.join(self.datapath, "values.csv"), VALUES + [("99A-ger", "ger", "99A", "x", "")])
+        wals_obj = wals(self.datapath, use_cache=False)
+        with redirect_stdout(io.StringIO()), self.assertRaises(ValueError):
+            wals_obj.get_feature_vector()
+        _write_csv(os.path.join(self.datapath, "values.csv"), VALUES)
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(wals_obj.get_language_matrix(LANGUAGE_IDS), expected)
+
+    def test_concurrent_first_use_loads_once(self):
+        expected = self.make_wals(use_cache=False).get_language_matrix(LANGUAGE_IDS)
+        wals_obj = wals(self.datapath, use_cache=False)
+        barrier = threading.Barrier(8)
+        results, errors = [], []
+
+        def first_use():
+            barrier.wait()
+            try:
+                results.append(wals_obj.get_language_matrix(LANGUAGE_IDS))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=first_use) for _ in range(8)]
+        with redirect_stdout(io.StringIO()) as output:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [expected] * 8)
+        self.assertEqual(output.getvalue().count("Reading WALS"), 1)
+        self.assertEqual(wals_obj.get_language_matrix(LANGUAGE_IDS), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()